@@ -13,6 +13,8 @@ import (
 	"github.com/flanksource/arch-unit/analysis/types"
 	"github.com/flanksource/arch-unit/internal/cache"
 	"github.com/flanksource/arch-unit/models"
+	"github.com/flanksource/arch-unit/shutdown"
+	"github.com/flanksource/commons/logger"
 )
 
 // PythonASTExtractor extracts AST information from Python source files
@@ -180,8 +182,35 @@ func (e *PythonASTExtractor) extractPackageName(filePath string) string {
 	return "main"
 }
 
-// runPythonASTExtraction runs the Python AST extraction script
+// pythonWorkers runs the extraction script in long-lived --server processes
+var pythonWorkers = newPythonWorkerPool(pythonASTExtractorScript)
+
+func init() {
+	shutdown.AddHookWithPriority("stop python AST workers", shutdown.PriorityWorkers, pythonWorkers.Close)
+}
+
+// runPythonASTExtraction runs the Python AST extraction script, preferring a
+// pooled worker process and falling back to a one-off invocation
 func (e *PythonASTExtractor) runPythonASTExtraction(filePath string) (*PythonASTResult, error) {
+	output, err := pythonWorkers.Extract(filePath)
+	if err != nil {
+		logger.Debugf("python AST worker failed for %s, running script directly: %v", filePath, err)
+		if output, err = e.runPythonASTScript(filePath); err != nil {
+			return nil, err
+		}
+	}
+
+	// Parse JSON output
+	var result PythonASTResult
+	if err := json.Unmarshal(output, &result); err != nil {
+		return nil, fmt.Errorf("failed to parse Python AST JSON: %w", err)
+	}
+
+	return &result, nil
+}
+
+// runPythonASTScript runs the Python AST extraction script once for a single file
+func (e *PythonASTExtractor) runPythonASTScript(filePath string) ([]byte, error) {
 	// Create temp file with Python script
 	tmpFile, err := os.CreateTemp("", "python_ast_*.py")
 	if err != nil {
@@ -206,13 +235,7 @@ func (e *PythonASTExtractor) runPythonASTExtraction(filePath string) (*PythonAST
 		}
 	}
 
-	// Parse JSON output
-	var result PythonASTResult
-	if err := json.Unmarshal(output, &result); err != nil {
-		return nil, fmt.Errorf("failed to parse Python AST JSON: %w", err)
-	}
-
-	return &result, nil
+	return output, nil
 }
 
 // mapPythonNodeType maps Python node types to generic AST node types
@@ -5,101 +5,111 @@ Extracts AST information from Python source files and outputs JSON
 """
 
 import ast
+import functools
 import json
+import os
 import sys
 from typing import List, Dict, Any, Optional
 
-
-class PythonASTNode:
-    """Represents a node in the Python AST"""
-    def __init__(self, node_type: str, name: str, start_line: int, end_line: int):
-        self.type = node_type
-        self.name = name
-        self.start_line = start_line
-        self.end_line = end_line
-        self.parameter_count = 0
-        self.return_count = 0
-        self.parameters = []
-        self.return_values = []
-        self.cyclomatic_complexity = 1
-        self.parent = ""
-        self.decorators = []
-        self.base_classes = []
-
-
-class CyclomaticComplexityCalculator(ast.NodeVisitor):
-    """Calculates cyclomatic complexity for a function/method"""
-
-    def __init__(self):
-        self.complexity = 1  # Base complexity
-
-    def visit_If(self, node):
-        self.complexity += 1
-        # Count elif clauses
-        if hasattr(node, 'orelse') and node.orelse:
-            if isinstance(node.orelse[0], ast.If):
-                # This is handled by the elif visit
-                pass
-            else:
-                # This is an else clause
-                pass
-        self.generic_visit(node)
-
-    def visit_While(self, node):
-        self.complexity += 1
-        self.generic_visit(node)
-
-    def visit_For(self, node):
-        self.complexity += 1
-        self.generic_visit(node)
-
-    def visit_ExceptHandler(self, node):
-        self.complexity += 1
-        self.generic_visit(node)
-
-    def visit_With(self, node):
-        self.complexity += 1
-        self.generic_visit(node)
-
-    def visit_AsyncWith(self, node):
-        self.complexity += 1
-        self.generic_visit(node)
-
-    def visit_AsyncFor(self, node):
-        self.complexity += 1
-        self.generic_visit(node)
-
-    def visit_BoolOp(self, node):
-        if isinstance(node.op, (ast.And, ast.Or)):
-            self.complexity += len(node.values) - 1
-        self.generic_visit(node)
-
-    def visit_ListComp(self, node):
-        for generator in node.generators:
-            if generator.ifs:
-                self.complexity += len(generator.ifs)
-        self.generic_visit(node)
-
-    def visit_SetComp(self, node):
-        for generator in node.generators:
-            if generator.ifs:
-                self.complexity += len(generator.ifs)
-        self.generic_visit(node)
-
-    def visit_DictComp(self, node):
-        for generator in node.generators:
-            if generator.ifs:
-                self.complexity += len(generator.ifs)
-        self.generic_visit(node)
-
-    def visit_GeneratorExp(self, node):
-        for generator in node.generators:
-            if generator.ifs:
-                self.complexity += len(generator.ifs)
-        self.generic_visit(node)
-
-
-class PythonASTExtractor(ast.NodeVisitor):
+# Set by _load_orjson in --server/--batch mode. For a single file the import
+# costs more than the faster encoding saves
+orjson = None
+
+
+# Complexity increment per decision-point node type, looked up by exact type
+_CPLX_INC = {
+    ast.If: 1,
+    ast.While: 1,
+    ast.For: 1,
+    ast.AsyncFor: 1,
+    ast.With: 1,
+    ast.AsyncWith: 1,
+    ast.ExceptHandler: 1,
+}
+
+# Opt-in on-disk cache of extraction results, keyed by file content. Its
+# modules are imported on first use so uncached runs don't pay for them
+_CACHE_ENABLED = os.environ.get("ARCHUNIT_AST_CACHE") == "1"
+_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "arch-unit", "py-ast")
+
+# Rendered names/annotations shorter than this are interned, as the same
+# short strings ("self", "str", "Optional[...]") recur across a file
+_INTERN_MAX_LEN = 64
+
+# Files handed to each worker at a time in --batch mode
+_BATCH_CHUNKSIZE = 16
+
+# Fields of compound statements that hold nested statement lists (or
+# except handlers / match cases, which in turn have a body)
+_BLOCK_FIELD_NAMES = frozenset(("body", "handlers", "orelse", "finalbody", "cases"))
+
+# Block fields per statement type, filled in as types are encountered
+_BLOCK_FIELDS: Dict[type, tuple] = {}
+
+# Comprehensions whose `if` filters each add a decision point
+_COMP_TYPES = frozenset((ast.ListComp, ast.SetComp, ast.DictComp, ast.GeneratorExp))
+
+
+def _render_type_expr(node) -> Optional[str]:
+    """Render a simple type expression exactly as ast.unparse would, or return
+    None if it has a shape that should be left to ast.unparse"""
+    t = type(node)
+    if t is ast.Name:
+        return node.id
+    if t is ast.Attribute:
+        value = _render_type_expr(node.value)
+        if value is None or type(node.value) not in (ast.Name, ast.Attribute, ast.Subscript):
+            return None
+        return f"{value}.{node.attr}"
+    if t is ast.Subscript:
+        value = _render_type_expr(node.value)
+        if value is None or type(node.value) not in (ast.Name, ast.Attribute, ast.Subscript):
+            return None
+        sl = node.slice
+        if type(sl) is ast.Tuple:
+            # Subscript tuples are rendered without parentheses, except for
+            # the empty and single-element forms
+            if len(sl.elts) < 2:
+                return None
+            elts = []
+            for elt in sl.elts:
+                rendered = _render_type_expr(elt)
+                if rendered is None or type(elt) is ast.Tuple:
+                    return None
+                elts.append(rendered)
+            return f"{value}[{', '.join(elts)}]"
+        rendered = _render_type_expr(sl)
+        if rendered is None:
+            return None
+        return f"{value}[{rendered}]"
+    if t is ast.BinOp:
+        # Left-associative X | Y | Z chains only; other operators, or a
+        # nested union on the right, need unparse's parenthesization
+        if type(node.op) is not ast.BitOr or type(node.right) is ast.BinOp:
+            return None
+        left_type = type(node.left)
+        if left_type is ast.BinOp and type(node.left.op) is not ast.BitOr:
+            return None
+        left = _render_type_expr(node.left)
+        right = _render_type_expr(node.right)
+        if left is None or right is None:
+            return None
+        return f"{left} | {right}"
+    if t is ast.Constant:
+        value = node.value
+        if value is None:
+            return "None"
+        if value is Ellipsis:
+            return "..."
+        # Plain forward references; other literals are left to unparse
+        if type(value) is str and node.kind is None and value.isascii() and value.isprintable() \
+                and "'" not in value and "\\" not in value:
+            return f"'{value}'"
+        return None
+    return None
+
+
+class PythonASTExtractor:
     """Main AST extractor class"""
 
     def __init__(self, source_code: str, file_path: str):
@@ -109,75 +119,94 @@ class PythonASTExtractor(ast.NodeVisitor):
         self.imports = []
         self.relationships = []
         self.current_class = None
-        self.source_lines = source_code.splitlines()
+        # Module name is derived from the file name
+        self._module_name = os.path.splitext(os.path.basename(file_path))[0]
+        # Handlers for the statements we extract, keyed by concrete node type
+        self._dispatch = {
+            ast.ClassDef: self.visit_ClassDef,
+            ast.FunctionDef: self.visit_FunctionDef,
+            ast.AsyncFunctionDef: self.visit_AsyncFunctionDef,
+            ast.Import: self.visit_Import,
+            ast.ImportFrom: self.visit_ImportFrom,
+        }
+
+    def _visit_body(self, stmts):
+        """Visit a list of statements, descending into compound statements
+        (if/try/with/for/while/match) to reach nested definitions and imports"""
+        for stmt in stmts:
+            t = type(stmt)
+            handler = self._dispatch.get(t)
+            if handler:
+                handler(stmt)
+            else:
+                self._visit_blocks(stmt, t)
+
+    def _visit_blocks(self, stmt, t):
+        """Visit the nested statement lists of a statement of type t"""
+        fields = _BLOCK_FIELDS.get(t)
+        if fields is None:
+            fields = _BLOCK_FIELDS[t] = tuple(f for f in t._fields if f in _BLOCK_FIELD_NAMES)
+        for field in fields:
+            self._visit_body(getattr(stmt, field))
 
     def extract(self) -> Dict[str, Any]:
         """Extract AST information and return as dictionary"""
         try:
-            tree = ast.parse(self.source_code, filename=self.file_path)
-            self.visit(tree)
+            # Plain PyCF_ONLY_AST compile: no type comments, and no optimize
+            # level, which on newer Pythons would constant-fold the tree
+            tree = compile(self.source_code, self.file_path, 'exec', ast.PyCF_ONLY_AST,
+                           dont_inherit=True)
+            self._visit_body(tree.body)
 
             return {
-                "module": self._get_module_name(),
-                "nodes": [self._node_to_dict(node) for node in self.nodes],
+                "module": self._module_name,
+                "nodes": self.nodes,
                 "imports": self.imports,
                 "relationships": self.relationships
             }
         except SyntaxError as e:
             # Return empty result for syntax errors
             return {
-                "module": self._get_module_name(),
+                "module": self._module_name,
                 "nodes": [],
                 "imports": [],
                 "relationships": []
             }
 
-    def _get_module_name(self) -> str:
-        """Extract module name from file path"""
-        import os
-        return os.path.splitext(os.path.basename(self.file_path))[0]
-
-    def _node_to_dict(self, node: PythonASTNode) -> Dict[str, Any]:
-        """Convert PythonASTNode to dictionary"""
-        return {
-            "type": node.type,
-            "name": node.name,
-            "start_line": node.start_line,
-            "end_line": node.end_line,
-            "parameter_count": node.parameter_count,
-            "return_count": node.return_count,
-            "parameters": node.parameters,
-            "return_values": node.return_values,
-            "cyclomatic_complexity": node.cyclomatic_complexity,
-            "parent": node.parent,
-            "decorators": node.decorators,
-            "base_classes": node.base_classes
-        }
-
     def visit_ClassDef(self, node):
         """Visit class definition"""
-        # Create class node
-        class_node = PythonASTNode(
-            node_type="class",
-            name=node.name,
-            start_line=node.lineno,
-            end_line=self._get_end_line(node)
-        )
-
-        # Extract base classes
-        class_node.base_classes = [self._get_name_from_node(base) for base in node.bases]
-
-        # Extract decorators
-        class_node.decorators = [self._get_name_from_node(dec) for dec in node.decorator_list]
-
-        self.nodes.append(class_node)
+        # Record class node directly in its serialized form
+        self.nodes.append({
+            "type": "class",
+            "name": node.name,
+            "start_line": node.lineno,
+            "end_line": self._get_end_line(node),
+            "parameter_count": 0,
+            "return_count": 0,
+            "parameters": [],
+            "return_values": [],
+            "cyclomatic_complexity": 1,
+            "parent": "",
+            "decorators": [self._get_name_from_node(dec) for dec in node.decorator_list],
+            "base_classes": [self._get_name_from_node(base) for base in node.bases]
+        })
 
         # Set current class context for methods
         previous_class = self.current_class
         self.current_class = node.name
 
-        # Visit class body
-        self.generic_visit(node)
+        # Visit class body: methods are handled directly, other members (nested
+        # classes, imports, conditionally defined methods) via the dispatch table
+        for child in node.body:
+            t = type(child)
+            if t is ast.FunctionDef or t is ast.AsyncFunctionDef:
+                self.visit_FunctionDef(child)
+                continue
+            handler = self._dispatch.get(t)
+            if handler:
+                handler(child)
+            else:
+                self._visit_blocks(child, t)
 
         # Restore previous class context
         self.current_class = previous_class
@@ -192,61 +221,53 @@ class PythonASTExtractor(ast.NodeVisitor):
             node_type = "function"
             parent = ""
 
-        # Create function/method node
-        func_node = PythonASTNode(
-            node_type=node_type,
-            name=node.name,
-            start_line=node.lineno,
-            end_line=self._get_end_line(node)
-        )
-        func_node.parent = parent
-
-        # Extract parameters
-        parameters = []
+        # Walk the function once, counting decision points for the cyclomatic
+        # complexity. Decorators, defaults and annotations are included along
+        # with the body, so e.g. `x=a and b` counts
+        complexity = 1  # Base complexity
+        stack = list(ast.iter_child_nodes(node))
+        while stack:
+            n = stack.pop()
+            t = type(n)
+            inc = _CPLX_INC.get(t)
+            if inc is not None:
+                complexity += inc
+            elif t is ast.BoolOp:
+                complexity += len(n.values) - 1
+            elif t in _COMP_TYPES:
+                for generator in n.generators:
+                    complexity += len(generator.ifs)
+            stack.extend(ast.iter_child_nodes(n))
+
+        # Extract parameters: regular arguments, then *args and **kwargs
         args = node.args
-
-        # Regular arguments
-        for arg in args.args:
-            param_type = self._get_annotation(arg.annotation) if arg.annotation else ""
-            parameters.append({
-                "name": arg.arg,
-                "type": param_type
-            })
-
-        # *args
+        parameters = [self._make_parameter(arg) for arg in args.args]
         if args.vararg:
-            param_type = self._get_annotation(args.vararg.annotation) if args.vararg.annotation else ""
-            parameters.append({
-                "name": f"*{args.vararg.arg}",
-                "type": param_type
-            })
-
-        # **kwargs
+            parameters.append(self._make_parameter(args.vararg, "*"))
         if args.kwarg:
-            param_type = self._get_annotation(args.kwarg.annotation) if args.kwarg.annotation else ""
-            parameters.append({
-                "name": f"**{args.kwarg.arg}",
-                "type": param_type
-            })
-
-        func_node.parameters = parameters
-        func_node.parameter_count = len(parameters)
+            parameters.append(self._make_parameter(args.kwarg, "**"))
 
         # Extract return type
         if node.returns:
-            return_type = self._get_annotation(node.returns)
-            func_node.return_values = [{"name": "", "type": return_type}]
-            func_node.return_count = 1
-
-        # Calculate cyclomatic complexity
-        complexity_calc = CyclomaticComplexityCalculator()
-        complexity_calc.visit(node)
-        func_node.cyclomatic_complexity = complexity_calc.complexity
-
-        # Extract decorators
-        func_node.decorators = [self._get_name_from_node(dec) for dec in node.decorator_list]
+            return_values = [{"name": "", "type": self._get_annotation(node.returns)}]
+        else:
+            return_values = []
 
-        self.nodes.append(func_node)
+        # Record function/method node directly in its serialized form
+        self.nodes.append({
+            "type": node_type,
+            "name": node.name,
+            "start_line": node.lineno,
+            "end_line": self._get_end_line(node),
+            "parameter_count": len(parameters),
+            "return_count": len(return_values),
+            "parameters": parameters,
+            "return_values": return_values,
+            "cyclomatic_complexity": complexity,
+            "parent": parent,
+            "decorators": [self._get_name_from_node(dec) for dec in node.decorator_list],
+            "base_classes": []
+        })
 
         # Don't visit function body to avoid nested function detection
         # self.generic_visit(node)
@@ -279,20 +300,16 @@ class PythonASTExtractor(ast.NodeVisitor):
             }
             self.imports.append(import_info)
 
+    def _make_parameter(self, arg: ast.arg, prefix: str = "") -> Dict[str, str]:
+        """Build the parameter record for a function argument"""
+        return {
+            "name": sys.intern(prefix + arg.arg),
+            "type": self._get_annotation(arg.annotation)
+        }
+
     def _get_end_line(self, node) -> int:
         """Get the end line of a node"""
-        if hasattr(node, 'end_lineno') and node.end_lineno:
-            return node.end_lineno
-
-        # Fallback: find the last line with content
-        start_line = node.lineno
-        max_line = start_line
-
-        for child in ast.walk(node):
-            if hasattr(child, 'lineno') and child.lineno:
-                max_line = max(max_line, child.lineno)
-
-        return max_line
+        return node.end_lineno or node.lineno
 
     def _get_annotation(self, annotation) -> str:
         """Extract type annotation as string"""
@@ -301,63 +318,241 @@ class PythonASTExtractor(ast.NodeVisitor):
 
         try:
             if isinstance(annotation, ast.Name):
-                return annotation.id
+                result = annotation.id
             elif isinstance(annotation, ast.Constant):
-                return str(annotation.value)
+                result = str(annotation.value)
             elif isinstance(annotation, ast.Attribute):
-                return f"{self._get_annotation(annotation.value)}.{annotation.attr}"
+                result = f"{self._get_annotation(annotation.value)}.{annotation.attr}"
             else:
-                # For complex annotations, return a simplified representation
-                return ast.unparse(annotation) if hasattr(ast, 'unparse') else ""
-        except:
-            return ""
+                # Common Optional[X] / X | None shapes are rendered directly;
+                # anything else gets a simplified representation from unparse
+                result = _render_type_expr(annotation)
+                if result is None:
+                    result = ast.unparse(annotation) if hasattr(ast, 'unparse') else ""
+        except (AttributeError, ValueError, RecursionError):
+            # e.g. integers too long for str(), or very deeply nested expressions
+            result = ""
+
+        if len(result) < _INTERN_MAX_LEN:
+            result = sys.intern(result)
+        return result
 
     def _get_name_from_node(self, node) -> str:
         """Extract name from various node types"""
+        if node is None:
+            return ""
+
         try:
             if isinstance(node, ast.Name):
-                return node.id
+                result = node.id
             elif isinstance(node, ast.Attribute):
-                return f"{self._get_name_from_node(node.value)}.{node.attr}"
+                result = f"{self._get_name_from_node(node.value)}.{node.attr}"
             elif isinstance(node, ast.Constant):
-                return str(node.value)
+                result = str(node.value)
             else:
-                return ast.unparse(node) if hasattr(ast, 'unparse') else ""
-        except:
-            return ""
+                result = ast.unparse(node) if hasattr(ast, 'unparse') else ""
+        except (AttributeError, ValueError, RecursionError):
+            # e.g. integers too long for str(), or very deeply nested expressions
+            result = ""
+
+        if len(result) < _INTERN_MAX_LEN:
+            result = sys.intern(result)
+        return result
+
+
+@functools.lru_cache(maxsize=None)
+def _script_digest() -> bytes:
+    """Digest of this script, so cached results are dropped when the extractor changes"""
+    import hashlib
+    with open(__file__, 'rb') as f:
+        return hashlib.blake2b(f.read(), digest_size=16).digest()
+
+
+def _cache_path(file_path: str, source_code: str) -> str:
+    """Path of the cached result for a file with the given content"""
+    import hashlib
+    h = hashlib.blake2b(_script_digest(), digest_size=16)
+    # The module name in the result is derived from the file name
+    h.update(os.path.basename(file_path).encode('utf-8'))
+    h.update(b"\0")
+    h.update(source_code.encode('utf-8'))
+    # orjson is only loaded in --server/--batch mode and escapes non-ASCII
+    # differently, so results from each encoder are kept apart
+    h.update(b"\0orjson" if orjson is not None else b"\0json")
+    return os.path.join(_CACHE_DIR, h.hexdigest() + ".json")
+
+
+def _read_cache(cache_path: str) -> Optional[str]:
+    """Return a cached result, or None on a miss"""
+    try:
+        with open(cache_path, 'r', encoding='utf-8') as f:
+            return f.read()
+    except OSError:
+        return None
 
 
-def main():
-    """Main entry point"""
-    if len(sys.argv) != 2:
-        print(json.dumps({
-            "module": "",
-            "nodes": [],
-            "imports": [],
-            "relationships": []
-        }))
-        sys.exit(1)
+def _write_cache(cache_path: str, output: str):
+    """Atomically store a result in the cache, ignoring failures"""
+    import tempfile
+    tmp_path = None
+    try:
+        os.makedirs(_CACHE_DIR, exist_ok=True)
+        with tempfile.NamedTemporaryFile('w', encoding='utf-8', dir=_CACHE_DIR,
+                                         suffix=".tmp", delete=False) as f:
+            tmp_path = f.name
+            f.write(output)
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # Don't leave the partial file behind, nothing else cleans the cache up
+        if tmp_path is not None:
+            try:
+                os.unlink(tmp_path)
+            except OSError:
+                pass
 
-    file_path = sys.argv[1]
 
+def _load_orjson():
+    """Encode with orjson from now on, if it is installed"""
+    global orjson
+    try:
+        import orjson as module
+    except ImportError:
+        return
+    orjson = module
+
+
+def _dumps(obj) -> str:
+    """Serialize to compact JSON, using orjson when it is installed"""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj).decode('utf-8')
+        except orjson.JSONEncodeError:
+            # e.g. lone surrogates in string constants, which json escapes
+            pass
+    return json.dumps(obj, separators=(',', ':'))
+
+
+def _write_result(result: Dict[str, Any], write):
+    """Serialize a result through write() piecewise, one node at a time"""
+    write('{"module":')
+    write(_dumps(result["module"]))
+    write(',"nodes":[')
+    first = True
+    for node in result["nodes"]:
+        if not first:
+            write(',')
+        first = False
+        write(_dumps(node))
+    write('],"imports":')
+    write(_dumps(result["imports"]))
+    write(',"relationships":')
+    write(_dumps(result["relationships"]))
+    write('}')
+
+
+def extract_json(file_path: str, write):
+    """Extract AST information from a file and write it through write() as a single line of JSON"""
     try:
         with open(file_path, 'r', encoding='utf-8') as f:
             source_code = f.read()
 
+        cache_path = _cache_path(file_path, source_code) if _CACHE_ENABLED else None
+        if cache_path:
+            cached = _read_cache(cache_path)
+            if cached is not None:
+                write(cached)
+                return
+
         extractor = PythonASTExtractor(source_code, file_path)
         result = extractor.extract()
 
-        print(json.dumps(result, indent=None, separators=(',', ':')))
-
     except Exception as e:
         # Return empty result on any error
+        write(json.dumps({
+            "module": "",
+            "nodes": [],
+            "imports": [],
+            "relationships": []
+        }))
+        return
+
+    if cache_path:
+        # The cache needs the whole document, so only buffer it in that case
+        parts = []
+        _write_result(result, parts.append)
+        output = ''.join(parts)
+        _write_cache(cache_path, output)
+        write(output)
+    else:
+        _write_result(result, write)
+
+
+def serve():
+    """Read newline-delimited file paths from stdin and write one line of JSON per path"""
+    _load_orjson()
+    write = sys.stdout.write
+    for line in sys.stdin:
+        extract_json(line.rstrip('\r\n'), write)
+        write('\n')
+        sys.stdout.flush()
+
+
+def _extract_one(file_path: str) -> str:
+    """Extract a single file to a JSON string (process pool entry point)"""
+    parts = []
+    extract_json(file_path, parts.append)
+    return ''.join(parts)
+
+
+def batch():
+    """Read file paths from stdin until EOF, extract them in parallel and write
+    one line of JSON per path in input order"""
+    _load_orjson()
+    paths = [line.rstrip('\r\n') for line in sys.stdin]
+    write = sys.stdout.write
+    workers = os.cpu_count() or 1
+
+    if workers == 1 or len(paths) <= _BATCH_CHUNKSIZE:
+        # Not worth the cost of starting worker processes
+        for path in paths:
+            extract_json(path, write)
+            write('\n')
+        return
+
+    # Imported here as multiprocessing is slow to load, and every other run skips it
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_load_orjson) as executor:
+        for output in executor.map(_extract_one, paths, chunksize=_BATCH_CHUNKSIZE):
+            write(output)
+            write('\n')
+
+
+def main():
+    """Main entry point"""
+    if len(sys.argv) != 2:
         print(json.dumps({
             "module": "",
             "nodes": [],
             "imports": [],
             "relationships": []
         }))
-        sys.exit(0)
+        sys.exit(1)
+
+    # orjson leaves non-ASCII characters unescaped; the reader expects UTF-8
+    sys.stdout.reconfigure(encoding='utf-8')
+
+    if sys.argv[1] == "--server":
+        # Long-lived worker: interpreter startup is paid once for many files
+        serve()
+        return
+
+    if sys.argv[1] == "--batch":
+        batch()
+        return
+
+    extract_json(sys.argv[1], sys.stdout.write)
+    sys.stdout.write('\n')
 
 
 if __name__ == "__main__":
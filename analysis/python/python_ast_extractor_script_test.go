@@ -0,0 +1,145 @@
+package python
+
+import (
+	"encoding/json"
+	"fmt"
+	"os"
+	"os/exec"
+	"path/filepath"
+	"strings"
+
+	. "github.com/onsi/ginkgo/v2"
+	. "github.com/onsi/gomega"
+)
+
+// runExtractorScript runs the extractor script directly with the given stdin
+// and extra environment, returning its stdout
+func runExtractorScript(stdin string, env []string, args ...string) string {
+	cmd := exec.Command("python3", append([]string{"python_ast_extractor.py"}, args...)...)
+	cmd.Stdin = strings.NewReader(stdin)
+	cmd.Env = append(append(os.Environ(), "ARCHUNIT_AST_CACHE=0"), env...)
+	output, err := cmd.Output()
+	Expect(err).NotTo(HaveOccurred())
+	return string(output)
+}
+
+// parseResultLines parses newline-delimited extractor results
+func parseResultLines(output string) []PythonASTResult {
+	var results []PythonASTResult
+	for _, line := range strings.Split(strings.TrimSuffix(output, "\n"), "\n") {
+		var result PythonASTResult
+		Expect(json.Unmarshal([]byte(line), &result)).To(Succeed())
+		results = append(results, result)
+	}
+	return results
+}
+
+// unparseAnnotation returns how ast.unparse renders a Python expression
+func unparseAnnotation(expr string) string {
+	cmd := exec.Command("python3", "-c", "import ast, sys; print(ast.unparse(ast.parse(sys.argv[1], mode='eval').body))", expr)
+	output, err := cmd.Output()
+	Expect(err).NotTo(HaveOccurred())
+	return strings.TrimSuffix(string(output), "\n")
+}
+
+var _ = Describe("Python AST Extractor Script", func() {
+	calculatorPath := filepath.Join("testdata", "calculator.py")
+
+	Context("in --server mode", func() {
+		It("should write one JSON line per path", func() {
+			missingPath := filepath.Join(GinkgoT().TempDir(), "missing.py")
+
+			output := runExtractorScript(calculatorPath+"\n"+missingPath+"\n", nil, "--server")
+
+			results := parseResultLines(output)
+			Expect(results).To(HaveLen(2))
+			Expect(results[0].Module).To(Equal("calculator"))
+			Expect(results[0].Nodes).NotTo(BeEmpty())
+			Expect(results[1].Module).To(BeEmpty(), "missing file should give an empty result")
+			Expect(results[1].Nodes).To(BeEmpty())
+		})
+	})
+
+	Context("in --batch mode", func() {
+		It("should write results in input order", func() {
+			dir := GinkgoT().TempDir()
+			var paths []string
+			// Enough files to exceed one pool chunk on multi-core hosts
+			for i := 0; i < 40; i++ {
+				path := filepath.Join(dir, fmt.Sprintf("module_%02d.py", i))
+				Expect(os.WriteFile(path, []byte(fmt.Sprintf("def func_%02d():\n    pass\n", i)), 0644)).To(Succeed())
+				paths = append(paths, path)
+			}
+
+			output := runExtractorScript(strings.Join(paths, "\n")+"\n", nil, "--batch")
+
+			results := parseResultLines(output)
+			Expect(results).To(HaveLen(len(paths)))
+			for i, result := range results {
+				Expect(result.Module).To(Equal(fmt.Sprintf("module_%02d", i)))
+				Expect(result.Nodes).To(HaveLen(1))
+				Expect(result.Nodes[0].Name).To(Equal(fmt.Sprintf("func_%02d", i)))
+			}
+		})
+	})
+
+	Context("with ARCHUNIT_AST_CACHE=1", func() {
+		It("should return identical bytes on a cache hit", func() {
+			home := GinkgoT().TempDir()
+			env := []string{"ARCHUNIT_AST_CACHE=1", "HOME=" + home}
+
+			uncached := runExtractorScript("", nil, calculatorPath)
+			first := runExtractorScript("", env, calculatorPath)
+			Expect(first).To(Equal(uncached))
+
+			entries, err := filepath.Glob(filepath.Join(home, ".cache", "arch-unit", "py-ast", "*.json"))
+			Expect(err).NotTo(HaveOccurred())
+			Expect(entries).To(HaveLen(1))
+			cached, err := os.ReadFile(entries[0])
+			Expect(err).NotTo(HaveOccurred())
+			Expect(string(cached) + "\n").To(Equal(first))
+
+			second := runExtractorScript("", env, calculatorPath)
+			Expect(second).To(Equal(first))
+		})
+
+		It("should not reuse --server results in single-file runs", func() {
+			home := GinkgoT().TempDir()
+			env := []string{"ARCHUNIT_AST_CACHE=1", "HOME=" + home}
+			// Non-ASCII text is escaped by json but not by orjson
+			path := filepath.Join(GinkgoT().TempDir(), "unicode.py")
+			Expect(os.WriteFile(path, []byte("def f(x: \"café\"):\n    pass\n"), 0644)).To(Succeed())
+
+			runExtractorScript(path+"\n", env, "--server")
+			uncached := runExtractorScript("", nil, path)
+			cached := runExtractorScript("", env, path)
+			Expect(cached).To(Equal(uncached))
+		})
+	})
+
+	DescribeTable("rendering parameter annotations the same as ast.unparse",
+		func(annotation string) {
+			path := filepath.Join(GinkgoT().TempDir(), "annotations.py")
+			Expect(os.WriteFile(path, []byte("def f(x: "+annotation+"):\n    pass\n"), 0644)).To(Succeed())
+
+			results := parseResultLines(runExtractorScript("", nil, path))
+			Expect(results).To(HaveLen(1))
+			Expect(results[0].Nodes).To(HaveLen(1))
+			Expect(results[0].Nodes[0].Parameters).To(HaveLen(1))
+			Expect(results[0].Nodes[0].Parameters[0].Type).To(Equal(unparseAnnotation(annotation)))
+		},
+		Entry("nested subscripts", "Optional[Dict[str, int]]"),
+		Entry("union chain", "A | B | None"),
+		Entry("parenthesized left union", "(A | B) | C"),
+		Entry("parenthesized right union", "A | (B | C)"),
+		Entry("union inside subscript", "Dict[str, int | None]"),
+		Entry("ellipsis", "Tuple[int, ...]"),
+		Entry("empty tuple", "Tuple[()]"),
+		Entry("single-element tuple", "Tuple[int,]"),
+		Entry("string literals with quotes", `Literal['a', "b\"c"]`),
+		Entry("u-prefixed string literal", "Literal[u'x']"),
+		Entry("forward reference", "Optional['Foo']"),
+		Entry("attribute of subscript", "A[B].C"),
+		Entry("list inside subscript", "Callable[[int], str]"),
+	)
+})
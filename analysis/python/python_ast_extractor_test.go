@@ -80,4 +80,17 @@ var _ = Describe("Python AST Extractor", func() {
 			Expect(foundMain).To(BeTrue(), "Should find main function")
 		})
 	})
+
+	Context("when a function has decision points outside its body", func() {
+		It("should count them towards cyclomatic complexity", func() {
+			testFile := filepath.Join(GinkgoT().TempDir(), "defaults.py")
+			source := "@skipif(a and b)\ndef g(x=a and b, y=[i for i in z if i]):\n    pass\n"
+			Expect(os.WriteFile(testFile, []byte(source), 0644)).To(Succeed())
+
+			result, err := extractor.ExtractFile(astCache, testFile, []byte(source))
+			Expect(err).NotTo(HaveOccurred())
+			Expect(result.Nodes).To(HaveLen(1))
+			Expect(result.Nodes[0].CyclomaticComplexity).To(Equal(4))
+		})
+	})
 })
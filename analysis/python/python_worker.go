@@ -0,0 +1,185 @@
+package python
+
+import (
+	"bufio"
+	"crypto/sha256"
+	"encoding/hex"
+	"fmt"
+	"io"
+	"os"
+	"os/exec"
+	"path/filepath"
+	"strings"
+	"sync"
+)
+
+// pythonWorker is a python process running the extractor script in --server
+// mode: it reads one file path per line on stdin and answers with one line of
+// JSON on stdout
+type pythonWorker struct {
+	cmd    *exec.Cmd
+	stdin  io.WriteCloser
+	stdout *bufio.Reader
+}
+
+// extract sends a file path to the worker and returns its JSON result
+func (w *pythonWorker) extract(filePath string) ([]byte, error) {
+	if _, err := io.WriteString(w.stdin, filePath+"\n"); err != nil {
+		return nil, fmt.Errorf("failed to send path to python worker: %w", err)
+	}
+	line, err := w.stdout.ReadBytes('\n')
+	if err != nil {
+		return nil, fmt.Errorf("failed to read python worker output: %w", err)
+	}
+	return line, nil
+}
+
+// stop closes the worker's stdin, which makes the script exit, and waits for it
+func (w *pythonWorker) stop() {
+	_ = w.stdin.Close()
+	_ = w.cmd.Wait()
+}
+
+// pythonWorkerPool keeps idle extractor processes around so the python
+// interpreter start-up is paid once per worker rather than once per file.
+// Workers are started on demand, so the pool grows to the number of
+// concurrent callers.
+type pythonWorkerPool struct {
+	script string
+
+	mu         sync.Mutex
+	idle       []*pythonWorker
+	scriptPath string
+	python     string
+	closed     bool
+}
+
+// newPythonWorkerPool creates a pool running the given extractor script
+func newPythonWorkerPool(script string) *pythonWorkerPool {
+	return &pythonWorkerPool{script: script}
+}
+
+// Extract runs the extractor on a file using an idle or newly started worker
+func (p *pythonWorkerPool) Extract(filePath string) ([]byte, error) {
+	if strings.ContainsAny(filePath, "\r\n") {
+		return nil, fmt.Errorf("path %q cannot be sent to the python worker", filePath)
+	}
+
+	w, err := p.acquire()
+	if err != nil {
+		return nil, err
+	}
+
+	output, err := w.extract(filePath)
+	if err != nil {
+		// The process is in an unknown state, don't reuse it
+		w.stop()
+		return nil, err
+	}
+
+	p.release(w)
+	return output, nil
+}
+
+// Close stops all idle workers; workers in use are stopped when released
+func (p *pythonWorkerPool) Close() {
+	p.mu.Lock()
+	idle := p.idle
+	p.idle = nil
+	p.closed = true
+	p.mu.Unlock()
+
+	for _, w := range idle {
+		w.stop()
+	}
+}
+
+// acquire returns an idle worker, starting a new one if there is none
+func (p *pythonWorkerPool) acquire() (*pythonWorker, error) {
+	p.mu.Lock()
+	if p.closed {
+		p.mu.Unlock()
+		return nil, fmt.Errorf("python worker pool is closed")
+	}
+	if n := len(p.idle); n > 0 {
+		w := p.idle[n-1]
+		p.idle = p.idle[:n-1]
+		p.mu.Unlock()
+		return w, nil
+	}
+	if err := p.prepare(); err != nil {
+		p.mu.Unlock()
+		return nil, err
+	}
+	python, scriptPath := p.python, p.scriptPath
+	p.mu.Unlock()
+
+	cmd := exec.Command(python, scriptPath, "--server")
+	stdin, err := cmd.StdinPipe()
+	if err != nil {
+		return nil, fmt.Errorf("failed to open python worker stdin: %w", err)
+	}
+	stdout, err := cmd.StdoutPipe()
+	if err != nil {
+		return nil, fmt.Errorf("failed to open python worker stdout: %w", err)
+	}
+	if err := cmd.Start(); err != nil {
+		return nil, fmt.Errorf("failed to start python worker: %w", err)
+	}
+
+	return &pythonWorker{cmd: cmd, stdin: stdin, stdout: bufio.NewReader(stdout)}, nil
+}
+
+// release returns a worker to the pool, or stops it if the pool was closed
+func (p *pythonWorkerPool) release(w *pythonWorker) {
+	p.mu.Lock()
+	if p.closed {
+		p.mu.Unlock()
+		w.stop()
+		return
+	}
+	p.idle = append(p.idle, w)
+	p.mu.Unlock()
+}
+
+// prepare finds the python interpreter and writes the script to disk, once.
+// Must be called with p.mu held.
+func (p *pythonWorkerPool) prepare() error {
+	if p.scriptPath != "" {
+		return nil
+	}
+
+	python, err := exec.LookPath("python3")
+	if err != nil {
+		if python, err = exec.LookPath("python"); err != nil {
+			return fmt.Errorf("python interpreter not found: %w", err)
+		}
+	}
+
+	// Name the script by its content so every run of the same build shares one
+	// file instead of leaving a temp file behind per run
+	sum := sha256.Sum256([]byte(p.script))
+	scriptPath := filepath.Join(os.TempDir(), "arch-unit-python-ast-"+hex.EncodeToString(sum[:8])+".py")
+	if existing, err := os.ReadFile(scriptPath); err != nil || string(existing) != p.script {
+		tmpFile, err := os.CreateTemp(filepath.Dir(scriptPath), "python_ast_*.py")
+		if err != nil {
+			return fmt.Errorf("failed to create temp file: %w", err)
+		}
+		_, writeErr := tmpFile.WriteString(p.script)
+		closeErr := tmpFile.Close()
+		if writeErr == nil {
+			writeErr = closeErr
+		}
+		if writeErr == nil {
+			writeErr = os.Rename(tmpFile.Name(), scriptPath)
+		}
+		if writeErr != nil {
+			_ = os.Remove(tmpFile.Name())
+			return fmt.Errorf("failed to write script: %w", writeErr)
+		}
+	}
+
+	p.python = python
+	p.scriptPath = scriptPath
+	return nil
+}
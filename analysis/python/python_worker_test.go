@@ -0,0 +1,66 @@
+package python
+
+import (
+	"encoding/json"
+	"path/filepath"
+
+	. "github.com/onsi/ginkgo/v2"
+	. "github.com/onsi/gomega"
+)
+
+var _ = Describe("Python Worker Pool", func() {
+	var pool *pythonWorkerPool
+	calculatorPath := filepath.Join("testdata", "calculator.py")
+
+	BeforeEach(func() {
+		pool = newPythonWorkerPool(pythonASTExtractorScript)
+	})
+
+	AfterEach(func() {
+		pool.Close()
+	})
+
+	extractModule := func(path string) string {
+		output, err := pool.Extract(path)
+		Expect(err).NotTo(HaveOccurred())
+		var result PythonASTResult
+		Expect(json.Unmarshal(output, &result)).To(Succeed())
+		return result.Module
+	}
+
+	It("should reuse one python process across files", func() {
+		Expect(extractModule(calculatorPath)).To(Equal("calculator"))
+		Expect(pool.idle).To(HaveLen(1))
+		pid := pool.idle[0].cmd.Process.Pid
+
+		Expect(extractModule(calculatorPath)).To(Equal("calculator"))
+		Expect(pool.idle).To(HaveLen(1))
+		Expect(pool.idle[0].cmd.Process.Pid).To(Equal(pid))
+	})
+
+	It("should return an empty result for a missing file", func() {
+		Expect(extractModule(filepath.Join(GinkgoT().TempDir(), "missing.py"))).To(BeEmpty())
+	})
+
+	It("should reject paths that would break the line protocol", func() {
+		_, err := pool.Extract("a\nb.py")
+		Expect(err).To(HaveOccurred())
+	})
+
+	It("should replace a worker that has died", func() {
+		Expect(extractModule(calculatorPath)).To(Equal("calculator"))
+		Expect(pool.idle[0].cmd.Process.Kill()).To(Succeed())
+
+		_, err := pool.Extract(calculatorPath)
+		Expect(err).To(HaveOccurred())
+		Expect(pool.idle).To(BeEmpty())
+
+		Expect(extractModule(calculatorPath)).To(Equal("calculator"))
+	})
+
+	It("should refuse work once closed", func() {
+		pool.Close()
+		_, err := pool.Extract(calculatorPath)
+		Expect(err).To(HaveOccurred())
+	})
+})